@@ -3,8 +3,9 @@
 from __future__ import annotations
 
 import logging
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterable, Optional, Sequence
+from typing import Iterable, Iterator, Mapping, Optional, Sequence
 
 import pandas as pd
 
@@ -29,17 +30,35 @@ CUSTOMERS_REQUIRED_COLUMNS: Sequence[str] = (
     "region",
 )
 
+# Целочисленные колонки sales, которые сужаем после чтения (int64 -> int8/16/32)
+SALES_INTEGER_COLUMNS: Sequence[str] = ("order_id", "quantity")
 
-def _read_csv(
-    path: Path,
-    *,
-    parse_dates: Optional[Iterable[str]] = None,
-    required_columns: Optional[Sequence[str]] = None,
-) -> pd.DataFrame:
-    """Общий помощник чтения CSV с обработкой ошибок и валидацией структуры."""
-    logger.info("Читаем файл %s", path)
+# Текстовые колонки sales читаем строками явно: при чтении порциями типы выводятся
+# по каждой порции отдельно, и "007" в порции из одних цифр превратилось бы в 7
+SALES_TEXT_COLUMNS: Mapping[str, str] = {
+    "customer_id": "str",
+    "product_id": "str",
+    "product_name": "str",
+    "category": "str",
+}
+
+# Текстовые колонки customers: customer_id должен совпадать с sales.customer_id
+CUSTOMERS_TEXT_COLUMNS: Mapping[str, str] = {
+    "customer_id": "str",
+    "customer_name": "str",
+    "email": "str",
+    "region": "str",
+}
+
+# Размер порции при потоковом чтении sales.csv
+SALES_CHUNK_SIZE = 200_000
+
+
+@contextmanager
+def _csv_errors(path: Path) -> Iterator[None]:
+    """Логирует типовые ошибки чтения CSV и пробрасывает их дальше."""
     try:
-        df = pd.read_csv(path, parse_dates=list(parse_dates or []))
+        yield
     except FileNotFoundError:
         logger.error("Файл %s не найден", path)
         raise
@@ -50,8 +69,14 @@ def _read_csv(
         logger.exception("Не удалось прочитать CSV %s", path)
         raise
 
+
+def _check_required_columns(
+    path: Path,
+    columns: Iterable[str],
+    required_columns: Optional[Sequence[str]],
+) -> None:
     if required_columns:
-        missing = sorted(set(required_columns) - set(df.columns))
+        missing = sorted(set(required_columns) - set(columns))
         if missing:
             logger.error(
                 "Файл %s не содержит обязательные колонки: %s",
@@ -60,16 +85,83 @@ def _read_csv(
             )
             raise ValueError(f"Missing required columns in {path}: {missing}")
 
+
+def _read_csv(
+    path: Path,
+    *,
+    parse_dates: Optional[Iterable[str]] = None,
+    dtype: Optional[Mapping[str, str]] = None,
+    required_columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """Общий помощник чтения CSV с обработкой ошибок и валидацией структуры."""
+    logger.info("Читаем файл %s", path)
+    with _csv_errors(path):
+        # engine="pyarrow" приводит dtype уже после разбора ("007" -> 7 -> "7"),
+        # поэтому строковые колонки читает C-парсер
+        df = pd.read_csv(path, parse_dates=list(parse_dates or []), dtype=dict(dtype or {}))
+
+    _check_required_columns(path, df.columns, required_columns)
+
     logger.info("Файл %s успешно прочитан (%d строк, %d колонок)", path, len(df), len(df.columns))
     return df
 
 
-def read_sales_csv(path: Path) -> pd.DataFrame:
-    """Читает sales.csv и приводит дату заказа."""
-    return _read_csv(
+def _iter_csv(
+    path: Path,
+    *,
+    chunksize: int,
+    parse_dates: Optional[Iterable[str]] = None,
+    dtype: Optional[Mapping[str, str]] = None,
+    required_columns: Optional[Sequence[str]] = None,
+    downcast_columns: Sequence[str] = (),
+) -> Iterator[pd.DataFrame]:
+    """Читает CSV порциями по chunksize строк, проверяя структуру до первой порции."""
+    logger.info("Читаем файл %s порциями по %d строк", path, chunksize)
+    with _csv_errors(path):
+        header = pd.read_csv(path, nrows=0)
+    _check_required_columns(path, header.columns, required_columns)
+
+    rows = 0
+    with _csv_errors(path):
+        # engine="pyarrow" не поддерживает chunksize, а потоковый pyarrow.csv.open_csv
+        # фиксирует типы по первому блоку и падает на кривой дате дальше по файлу
+        # вместо errors="coerce" в transform, поэтому здесь C-парсер
+        with pd.read_csv(
+            path,
+            chunksize=chunksize,
+            parse_dates=list(parse_dates or []),
+            dtype=dict(dtype or {}),
+        ) as reader:
+            for chunk in reader:
+                rows += len(chunk)
+                yield _downcast_integers(chunk, downcast_columns)
+
+    logger.info("Файл %s успешно прочитан (%d строк)", path, rows)
+
+
+def _downcast_integers(df: pd.DataFrame, columns: Sequence[str]) -> pd.DataFrame:
+    """Сужает целочисленные колонки до минимального типа, вмещающего значения.
+
+    Колонки с пропусками (float) не трогаем: их чистит transform. Цены
+    остаются float64, чтобы не терять копейки при переводе в DECIMAL.
+    """
+    downcast = {
+        column: pd.to_numeric(df[column], downcast="integer")
+        for column in columns
+        if pd.api.types.is_integer_dtype(df[column])
+    }
+    return df.assign(**downcast) if downcast else df
+
+
+def iter_sales_csv(path: Path, chunksize: int = SALES_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Читает sales.csv порциями, чтобы не держать весь файл в памяти."""
+    return _iter_csv(
         path,
+        chunksize=chunksize,
         parse_dates=["order_date"],
+        dtype=SALES_TEXT_COLUMNS,
         required_columns=SALES_REQUIRED_COLUMNS,
+        downcast_columns=SALES_INTEGER_COLUMNS,
     )
 
 
@@ -78,5 +170,6 @@ def read_customers_csv(path: Path) -> pd.DataFrame:
     return _read_csv(
         path,
         parse_dates=["registration_date"],
+        dtype=CUSTOMERS_TEXT_COLUMNS,
         required_columns=CUSTOMERS_REQUIRED_COLUMNS,
     )
@@ -2,18 +2,50 @@
 
 from __future__ import annotations
 
+import io
 import logging
 from pathlib import Path
-from typing import Sequence
+from typing import Iterable, Sequence
 
 import pandas as pd
 import psycopg2
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from psycopg2.extensions import connection as PgConnection
+from psycopg2.extras import execute_values
 
 from config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD, SQL_DIR
 
 logger = logging.getLogger(__name__)
 
+# Размер пачки для execute_values: дальше 10k строк выигрыш почти не растёт.
+EXECUTE_VALUES_PAGE_SIZE = 10_000
+
+# Сколько байт copy_expert забирает из источника за одно чтение
+COPY_READ_SIZE = 1 << 20
+
+SALES_COLUMNS: Sequence[str] = (
+    "order_id",
+    "customer_id",
+    "product_id",
+    "product_name",
+    "quantity",
+    "unit_price",
+    "total_price",
+    "order_date",
+    "category",
+    "month",
+)
+
+CUSTOMERS_COLUMNS: Sequence[str] = (
+    "customer_id",
+    "customer_name",
+    "email",
+    "registration_date",
+    "region",
+    "customer_days",
+)
+
 
 def get_connection() -> PgConnection:
     """Возвращает подключение к PostgreSQL."""
@@ -55,39 +87,15 @@ def truncate_tables(conn: PgConnection) -> None:
     logger.info("Таблицы очищены")
 
 
-def load_sales(conn: PgConnection, df_sales: pd.DataFrame) -> None:
-    sql = (
-        "INSERT INTO sales (order_id, customer_id, product_id, product_name, quantity, "
-        "unit_price, total_price, order_date, category, month) VALUES (" + ", ".join(["%s"] * 10) + ")"
-    )
-    rows = [
-        (
-            int(row.order_id),
-            row.customer_id,
-            row.product_id,
-            row.product_name,
-            int(row.quantity),
-            float(row.unit_price),
-            float(row.total_price),
-            _to_date(row.order_date),
-            row.category,
-            row.month,
-        )
-        for row in df_sales.itertuples(index=False)
-    ]
-    _executemany(conn, sql, rows, "sales")
+def load_sales_chunks(conn: PgConnection, chunks: Iterable[pd.DataFrame]) -> None:
+    """Загружает порции продаж одной командой COPY и одной транзакцией."""
+    frames = (chunk.astype({"order_id": "int64", "quantity": "int64"}) for chunk in chunks)
+    _copy_from(conn, frames, "sales", SALES_COLUMNS)
 
 
 def load_customers(conn: PgConnection, df_customers: pd.DataFrame) -> None:
-    sql = """
-    INSERT INTO customers (
-        customer_id,
-        customer_name,
-        email,
-        registration_date,
-        region,
-        customer_days
-    ) VALUES (%s, %s, %s, %s, %s, %s)
+    sql = f"""
+    INSERT INTO customers ({", ".join(CUSTOMERS_COLUMNS)}) VALUES %s
     ON CONFLICT (customer_id) DO UPDATE SET
         customer_name = EXCLUDED.customer_name,
         email = EXCLUDED.email,
@@ -95,72 +103,208 @@ def load_customers(conn: PgConnection, df_customers: pd.DataFrame) -> None:
         region = EXCLUDED.region,
         customer_days = EXCLUDED.customer_days;
     """
-    rows = [
-        (
-            row.customer_id,
-            row.customer_name,
-            row.email,
-            _to_date(row.registration_date),
-            row.region,
-            int(row.customer_days) if pd.notna(row.customer_days) else None,
+    # ON CONFLICT не может обновить одну строку дважды за команду: оставляем
+    # последнюю запись по клиенту, как это делала построчная вставка.
+    df_customers = df_customers.drop_duplicates(subset="customer_id", keep="last")
+    df_customers = df_customers.astype({"customer_days": "Int64"})
+    df_customers["registration_date"] = df_customers["registration_date"].dt.date
+    _execute_values(conn, sql, _to_rows(df_customers, CUSTOMERS_COLUMNS), "customers")
+
+
+def delete_duplicate_sales(conn: PgConnection) -> None:
+    """Удаляет дубликаты заказов, попавшие в разные порции sales.csv."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            DELETE FROM sales
+            WHERE id IN (
+                SELECT id
+                FROM (
+                    SELECT
+                        id,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY order_id, product_id, quantity, unit_price
+                            ORDER BY id
+                        ) AS row_number
+                    FROM sales
+                ) numbered
+                WHERE row_number > 1
+            );
+            """
         )
-        for row in df_customers.itertuples(index=False)
-    ]
-    _executemany(conn, sql, rows, "customers")
+        deleted = cur.rowcount
+    conn.commit()
+    if deleted:
+        logger.warning("Удалено %d дубликатов заказов между порциями", deleted)
 
 
-def load_sales_summary(conn: PgConnection, df_summary: pd.DataFrame) -> None:
-    sql = (
-        "INSERT INTO sales_summary (category, total_sales, total_quantity, average_order_value, period_date) "
-        "VALUES (" + ", ".join(["%s"] * 5) + ")"
-    )
-    rows = [
-        (
-            row.category,
-            float(row.total_sales),
-            int(row.total_quantity),
-            float(row.average_order_value),
-            _to_date(row.period_date),
+def refresh_sales_summary(conn: PgConnection) -> None:
+    """Строит сводную таблицу продаж по категориям и месяцам средствами PostgreSQL."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO sales_summary (
+                category,
+                total_sales,
+                total_quantity,
+                average_order_value,
+                period_date
+            )
+            SELECT
+                category,
+                SUM(total_price),
+                SUM(quantity),
+                COALESCE(SUM(total_price) / NULLIF(COUNT(DISTINCT order_id), 0), 0),
+                TO_DATE(month, 'YYYY-MM')
+            FROM sales
+            GROUP BY category, month;
+            """
         )
-        for row in df_summary.itertuples(index=False)
-    ]
-    _executemany(conn, sql, rows, "sales_summary")
+        rows = cur.rowcount
+    conn.commit()
+    logger.info("Сводная таблица продаж сформирована (%d строк)", rows)
 
 
-def load_product_ranking(conn: PgConnection, df_ranking: pd.DataFrame) -> None:
-    sql = (
-        "INSERT INTO product_ranking (product_id, product_name, total_sold, total_revenue, rank_position) "
-        "VALUES (" + ", ".join(["%s"] * 5) + ")"
-    )
-    rows = [
-        (
-            row.product_id,
-            row.product_name,
-            int(row.total_sold),
-            float(row.total_revenue),
-            int(row.rank_position),
+def refresh_product_ranking(conn: PgConnection, top_n: int = 5) -> None:
+    """Строит рейтинг самых продаваемых товаров средствами PostgreSQL."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO product_ranking (
+                product_id,
+                product_name,
+                total_sold,
+                total_revenue,
+                rank_position
+            )
+            SELECT product_id, product_name, total_sold, total_revenue, rank_position
+            FROM (
+                SELECT
+                    product_id,
+                    product_name,
+                    SUM(quantity) AS total_sold,
+                    SUM(total_price) AS total_revenue,
+                    ROW_NUMBER() OVER (
+                        ORDER BY SUM(quantity) DESC, SUM(total_price) DESC
+                    ) AS rank_position
+                FROM sales
+                GROUP BY product_id, product_name
+            ) ranked
+            WHERE rank_position <= %s;
+            """,
+            (top_n,),
         )
-        for row in df_ranking.itertuples(index=False)
-    ]
-    _executemany(conn, sql, rows, "product_ranking")
+        rows = cur.rowcount
+    conn.commit()
+    logger.info("Сформирован рейтинг товаров (топ %d)", rows)
+
+
+def fetch_avg_check_by_region(conn: PgConnection) -> pd.DataFrame:
+    """Рассчитывает средний чек по регионам по загруженным sales и customers."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT
+                COALESCE(c.region, 'Unknown') AS region,
+                AVG(o.order_total)::float8 AS avg_check,
+                COUNT(DISTINCT o.order_id) AS orders_count
+            FROM (
+                SELECT order_id, customer_id, SUM(total_price) AS order_total
+                FROM sales
+                GROUP BY order_id, customer_id
+            ) o
+            LEFT JOIN customers c ON c.customer_id = o.customer_id
+            GROUP BY 1
+            ORDER BY avg_check DESC;
+            """
+        )
+        result = pd.DataFrame(cur.fetchall(), columns=[column.name for column in cur.description])
+    logger.info("Средний чек по регионам рассчитан (%d регионов)", len(result))
+    return result
+
 
+def _copy_from(
+    conn: PgConnection,
+    frames: Iterable[pd.DataFrame],
+    table: str,
+    columns: Sequence[str],
+) -> None:
+    """Загружает поток DataFrame в таблицу одной командой COPY FROM STDIN."""
+    reader = _CsvFramesReader(frames, columns)
+    with conn.cursor() as cur:
+        cur.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, ENCODING 'UTF8')",
+            reader,
+            size=COPY_READ_SIZE,
+        )
+    conn.commit()
+    if reader.rows:
+        logger.info("Загружено %d строк в %s", reader.rows, table)
+    else:
+        logger.info("Нет данных для загрузки в %s", table)
 
-def _executemany(conn: PgConnection, sql: str, rows: Sequence[Sequence], entity: str) -> None:
+
+class _CsvFramesReader:
+    """Файлоподобный источник для copy_expert: сериализует DataFrame в CSV по мере чтения.
+
+    Следующий DataFrame запрашивается у итератора только когда COPY дочитал
+    предыдущий, поэтому в памяти одновременно находится одна порция CSV.
+    """
+
+    def __init__(self, frames: Iterable[pd.DataFrame], columns: Sequence[str]) -> None:
+        self._frames = iter(frames)
+        self._columns = columns
+        self._buffer = io.BytesIO()
+        self.rows = 0
+
+    def read(self, size: int = -1) -> bytes:
+        while True:
+            data = self._buffer.read(size)
+            if data:
+                return data
+            frame = next(self._frames, None)
+            if frame is None:
+                return b""
+            self._buffer = _to_csv_buffer(frame, self._columns)
+            self.rows += len(frame)
+
+
+def _execute_values(conn: PgConnection, sql: str, rows: Sequence[Sequence], entity: str) -> None:
+    """Вставляет строки многострочными INSERT ... VALUES пачками по EXECUTE_VALUES_PAGE_SIZE."""
     if not rows:
         logger.info("Нет данных для загрузки в %s", entity)
         return
 
     logger.info("Загружаем %d строк в %s", len(rows), entity)
     with conn.cursor() as cur:
-        cur.executemany(sql, rows)
+        execute_values(cur, sql, rows, page_size=EXECUTE_VALUES_PAGE_SIZE)
     conn.commit()
     logger.info("Загрузка в %s завершена", entity)
 
 
-def _to_date(value) -> object:
-    """Преобразует pandas.Timestamp / datetime в date."""
-    if isinstance(value, pd.Timestamp):
-        return value.date()
-    if hasattr(value, "date"):
-        return value.date()
-    return value
+def _to_rows(df: pd.DataFrame, columns: Sequence[str]) -> list:
+    """Поколоночно переводит DataFrame в список строк из Python-объектов (NaN/NaT -> None)."""
+    frame = df[list(columns)]
+    return frame.astype(object).where(frame.notna(), None).to_numpy().tolist()
+
+
+def _to_csv_buffer(df: pd.DataFrame, columns: Sequence[str]) -> io.BytesIO:
+    """Сериализует колонки DataFrame в CSV-буфер для COPY средствами Arrow (пустое значение = NULL)."""
+    table = pa.Table.from_pandas(df[list(columns)], preserve_index=False)
+    arrays = []
+    for field, column in zip(table.schema, table.columns):
+        if pa.types.is_timestamp(field.type):
+            # DATE-колонки: пишем только дату, без времени
+            column = column.cast(pa.date32(), safe=False)
+        elif pa.types.is_dictionary(field.type):
+            column = column.cast(field.type.value_type)
+        arrays.append(column)
+
+    buf = io.BytesIO()
+    pacsv.write_csv(
+        pa.table(arrays, names=table.column_names),
+        buf,
+        write_options=pacsv.WriteOptions(include_header=False),
+    )
+    buf.seek(0)
+    return buf
@@ -1,11 +1,11 @@
-"""Модуль Transform: очистка данных и расчёт агрегатов."""
+"""Модуль Transform: очистка и обогащение данных."""
 
 from __future__ import annotations
 
 import logging
-import re
 from typing import List
 
+import numpy as np
 import pandas as pd
 
 logger = logging.getLogger(__name__)
@@ -14,53 +14,66 @@ logger = logging.getLogger(__name__)
 def transform_sales(df_sales: pd.DataFrame) -> pd.DataFrame:
     """Очищает и обогащает данные о продажах."""
     logger.info("Начинаем обработку продаж (%d строк)", len(df_sales))
-    df = df_sales.copy()
-
-    # Приведение даты
-    df["order_date"] = pd.to_datetime(df["order_date"], errors="coerce")
+    # Приведение даты; при copy-on-write (pandas 3) assign не копирует остальные колонки
+    df = df_sales.assign(order_date=pd.to_datetime(df_sales["order_date"], errors="coerce"))
     invalid_order_dates = int(df["order_date"].isna().sum())
     if invalid_order_dates:
         logger.warning("Не удалось распарсить order_date у %d строк", invalid_order_dates)
 
     # Вычисление производных колонок
     df["total_price"] = df["quantity"] * df["unit_price"]
-    df["month"] = df["order_date"].dt.to_period("M").astype(str)
-
-    # Поиск дубликатов
-    dedup_subset: List[str] = ["order_id", "product_id", "quantity", "unit_price"]
-    duplicates_mask = df.duplicated(subset=dedup_subset, keep=False)
-    duplicates_count = int(duplicates_mask.sum())
-    if duplicates_count:
-        logger.warning("Обнаружено %d дубликатов заказов, удаляем их", duplicates_count)
-        df = df.drop_duplicates(subset=dedup_subset, keep="first")
+    df["month"] = _month_labels(df["order_date"])
 
     # Удаление строк с пропусками в критических полях
     required_cols = ["order_id", "customer_id", "order_date", "quantity", "unit_price"]
-    missing_mask = df[required_cols].isna().any(axis=1)
+    missing_mask = np.zeros(len(df), dtype=bool)
+    for column in required_cols:
+        missing_mask |= df[column].isna().to_numpy()
     missing_count = int(missing_mask.sum())
     if missing_count:
         logger.warning("Удаляем %d строк с пропусками в критических полях", missing_count)
-        df = df[~missing_mask].copy()
+        df = df.loc[~missing_mask]
+
+    # Поиск дубликатов среди полных строк: так же считает delete_duplicate_sales
+    # по загруженной таблице, и результат не зависит от границ порций
+    dedup_subset: List[str] = ["order_id", "product_id", "quantity", "unit_price"]
+    # Один int64-хеш на строку вместо составного ключа из четырёх колонок
+    dedup_key = pd.util.hash_pandas_object(df[dedup_subset], index=False)
+    duplicates_count = int(dedup_key.duplicated(keep=False).sum())
+    if duplicates_count:
+        logger.warning("Обнаружено %d дубликатов заказов, удаляем их", duplicates_count)
+        df = df.loc[~dedup_key.duplicated(keep="first").to_numpy()]
 
     # Заполнение категории значением по умолчанию
     category_missing = int(df["category"].isna().sum())
     if category_missing:
         logger.warning("Подставляем 'Unknown' для %d строк без категории", category_missing)
-        df["category"] = df["category"].fillna("Unknown")
+        df = df.assign(category=df["category"].fillna("Unknown"))
+
+    # Категориальные колонки: группировки хешируют int-коды, а не строки
+    df = df.astype({column: "category" for column in ("category", "product_id", "product_name")})
 
     logger.info("Обработка продаж завершена (%d строк)", len(df))
     return df
 
 
+def _month_labels(dates: pd.Series) -> pd.Categorical:
+    """Возвращает месяц в формате YYYY-MM, форматируя только уникальные месяцы."""
+    months = dates.to_numpy().astype("datetime64[M]")
+    codes, uniques = pd.factorize(months.view("int64"))
+    labels = np.datetime_as_string(uniques.astype("datetime64[M]"), unit="M")
+    return pd.Categorical.from_codes(codes, labels)
+
+
 def transform_customers(
     df_customers: pd.DataFrame,
     snapshot_date: pd.Timestamp | None = None,
 ) -> pd.DataFrame:
     """Очищает и расширяет данные о клиентах."""
     logger.info("Начинаем обработку клиентов (%d строк)", len(df_customers))
-    df = df_customers.copy()
-
-    df["registration_date"] = pd.to_datetime(df["registration_date"], errors="coerce")
+    df = df_customers.assign(
+        registration_date=pd.to_datetime(df_customers["registration_date"], errors="coerce")
+    )
     invalid_registration_dates = int(df["registration_date"].isna().sum())
     if invalid_registration_dates:
         logger.warning(
@@ -73,85 +86,33 @@ def transform_customers(
     missing_id_count = int(missing_ids.sum())
     if missing_id_count:
         logger.warning("Удаляем %d записей без customer_id", missing_id_count)
-        df = df[~missing_ids].copy()
+        df = df.loc[~missing_ids]
 
     # Валидация email
-    email_pattern = re.compile(r"^[\w\.-]+@[\w\.-]+\.\w+$")
-    emails = df["email"].fillna("")
-    df["is_email_valid"] = emails.apply(lambda value: bool(email_pattern.match(value)))
+    # \w в RE2 только ASCII, поэтому буквы и цифры задаём Unicode-классами:
+    # кириллические адреса вида иван@почта.рф остаются валидными
+    email_pattern = r"^[\p{L}\p{N}_.-]+@[\p{L}\p{N}_.-]+\.[\p{L}\p{N}_]+$"
+    # Arrow-строки: регулярка выполняется в C++ (RE2) без Python-цикла по строкам
+    emails = df["email"].astype("string[pyarrow]")
+    df = df.assign(is_email_valid=emails.str.match(email_pattern, na=False).astype(bool))
     invalid_emails = int((~df["is_email_valid"]).sum())
     if invalid_emails:
         logger.warning("Найдено %d невалидных email", invalid_emails)
 
     # Заполнение региона
-    region_missing = int(df["region"].isna().sum())
+    region = df["region"]
+    region_missing = int(region.isna().sum())
     if region_missing:
         logger.warning("Подставляем 'Unknown' для %d клиентов без региона", region_missing)
-        df["region"] = df["region"].fillna("Unknown")
+        region = region.fillna("Unknown")
+    df = df.assign(region=region.astype("category"))
 
     # Срок отношений с клиентом
     reference_date = (snapshot_date or pd.Timestamp.today()).normalize()
-    df["customer_days"] = (reference_date - df["registration_date"]).dt.days
+    # Вычитание в днях сразу даёт целые числа без промежуточного timedelta64[ns]
+    registration_days = df["registration_date"].to_numpy().astype("datetime64[D]")
+    days = (np.datetime64(reference_date.date(), "D") - registration_days).astype("int32")
+    df = df.assign(customer_days=pd.arrays.IntegerArray(days, np.isnat(registration_days)))
 
     logger.info("Обработка клиентов завершена (%d строк)", len(df))
     return df
-
-
-def create_sales_summary(df_sales: pd.DataFrame) -> pd.DataFrame:
-    """Возвращает агрегацию продаж по категориям и месяцам."""
-    group = df_sales.groupby(["category", "month"], dropna=False)
-    summary = (
-        group.agg(total_sales=("total_price", "sum"), total_quantity=("quantity", "sum"))
-        .reset_index()
-    )
-
-    order_counts = group["order_id"].nunique().reset_index(name="order_count")
-    summary = summary.merge(order_counts, on=["category", "month"], how="left")
-
-    summary["average_order_value"] = summary["total_sales"] / summary["order_count"].replace({0: pd.NA})
-    summary["average_order_value"] = summary["average_order_value"].fillna(0)
-    summary["period_date"] = pd.to_datetime(summary["month"] + "-01")
-    summary = summary.drop(columns=["order_count"])
-
-    logger.info("Сводная таблица продаж сформирована (%d строк)", len(summary))
-    return summary
-
-
-def create_avg_check_by_region(df_sales: pd.DataFrame, df_customers: pd.DataFrame) -> pd.DataFrame:
-    """Рассчитывает средний чек по регионам."""
-    order_totals = (
-        df_sales.groupby(["order_id", "customer_id"], as_index=False)["total_price"]
-        .sum()
-        .rename(columns={"total_price": "order_total"})
-    )
-
-    enriched = order_totals.merge(
-        df_customers[["customer_id", "region"]],
-        on="customer_id",
-        how="left",
-    )
-    enriched["region"] = enriched["region"].fillna("Unknown")
-
-    result = (
-        enriched.groupby("region", as_index=False)
-        .agg(avg_check=("order_total", "mean"), orders_count=("order_id", "nunique"))
-        .sort_values("avg_check", ascending=False)
-    )
-
-    logger.info("Средний чек по регионам рассчитан (%d регионов)", len(result))
-    return result
-
-
-def create_product_ranking(df_sales: pd.DataFrame, top_n: int = 5) -> pd.DataFrame:
-    """Возвращает рейтинг самых продаваемых товаров."""
-    ranking = (
-        df_sales.groupby(["product_id", "product_name"], as_index=False)
-        .agg(total_sold=("quantity", "sum"), total_revenue=("total_price", "sum"))
-        .sort_values(["total_sold", "total_revenue"], ascending=False)
-    )
-
-    ranking = ranking.head(top_n).reset_index(drop=True)
-    ranking["rank_position"] = range(1, len(ranking) + 1)
-
-    logger.info("Сформирован рейтинг товаров (топ %d)", len(ranking))
-    return ranking
@@ -3,30 +3,36 @@
 from __future__ import annotations
 
 import logging
+import os
 import sys
 import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Deque, Iterable, Iterator
 
+import pandas as pd
 import psycopg2
 
 from config import DATA_DIR
-from etl.extract import read_sales_csv, read_customers_csv
-from etl.transform import (
-    transform_sales,
-    transform_customers,
-    create_sales_summary,
-    create_product_ranking,
-    create_avg_check_by_region,
-)
+from etl.extract import iter_sales_csv, read_customers_csv
+from etl.transform import transform_sales, transform_customers
 from etl.load import (
     get_connection,
     create_tables,
     truncate_tables,
-    load_sales,
+    load_sales_chunks,
     load_customers,
-    load_sales_summary,
-    load_product_ranking,
+    delete_duplicate_sales,
+    refresh_sales_summary,
+    refresh_product_ranking,
+    fetch_avg_check_by_region,
 )
 
+# Сколько порций продаж одновременно отдано в пул и ещё не загружено.
+# Пиклинг порции в процесс и обратно сопоставим с самой обработкой,
+# поэтому держим окно узким, чтобы память оставалась порядка одной-двух порций.
+SALES_CHUNKS_IN_FLIGHT = 2
+
 
 def setup_logging() -> None:
     logging.basicConfig(
@@ -58,33 +64,62 @@ def wait_for_db(max_retries: int = 10, delay: float = 2.0) -> None:
     raise RuntimeError("Не удалось дождаться готовности БД")
 
 
+def available_cpus() -> int:
+    """Число CPU, доступных процессу с учётом affinity (cpuset контейнера)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # нет на macOS/Windows
+        return os.cpu_count() or 1
+
+
+def transform_sales_chunks(
+    pool: Executor,
+    chunks: Iterable[pd.DataFrame],
+    max_in_flight: int,
+) -> Iterator[pd.DataFrame]:
+    """Обрабатывает порции продаж в пуле, сохраняя порядок и ограничивая число порций в памяти."""
+    pending: Deque[Future] = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(transform_sales, chunk))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
 def main() -> None:
     setup_logging()
     logger = logging.getLogger("etl")
 
     try:
-        # Extract
-        sales_df = read_sales_csv(DATA_DIR / "sales.csv")
-        customers_df = read_customers_csv(DATA_DIR / "customers.csv")
-
-        # Transform
-        sales_df = transform_sales(sales_df)
-        customers_df = transform_customers(customers_df)
-        sales_summary_df = create_sales_summary(sales_df)
-        product_ranking_df = create_product_ranking(sales_df)
-        avg_check_by_region_df = create_avg_check_by_region(sales_df, customers_df)
-        logger.info("Средний чек по регионам:\n%s", avg_check_by_region_df.to_string(index=False))
-
-        wait_for_db()
+        workers = max(1, min(available_cpus(), SALES_CHUNKS_IN_FLIGHT))
+        with ProcessPoolExecutor(max_workers=workers, initializer=setup_logging) as pool:
+            # Клиенты обрабатываются в фоне, пока ждём готовности БД
+            customers_future = pool.submit(
+                transform_customers, read_customers_csv(DATA_DIR / "customers.csv")
+            )
 
-        # Load
-        with get_connection() as conn:
-            create_tables(conn)
-            truncate_tables(conn)
-            load_sales(conn, sales_df)
-            load_customers(conn, customers_df)
-            load_sales_summary(conn, sales_summary_df)
-            load_product_ranking(conn, product_ranking_df)
+            wait_for_db()
+
+            with get_connection() as conn:
+                create_tables(conn)
+                truncate_tables(conn)
+                load_customers(conn, customers_future.result())
+
+                # Порции продаж очищаются в пуле процессов и потоком уходят
+                # в одну команду COPY: одна транзакция на всю загрузку
+                sales_chunks = iter_sales_csv(DATA_DIR / "sales.csv")
+                load_sales_chunks(
+                    conn,
+                    transform_sales_chunks(pool, sales_chunks, SALES_CHUNKS_IN_FLIGHT),
+                )
+                delete_duplicate_sales(conn)
+
+                # Агрегаты считаются в PostgreSQL по уже загруженной таблице sales
+                refresh_sales_summary(conn)
+                refresh_product_ranking(conn)
+                avg_check_by_region_df = fetch_avg_check_by_region(conn)
+        logger.info("Средний чек по регионам:\n%s", avg_check_by_region_df.to_string(index=False))
 
         logger.info("ETL-процесс успешно завершён")
 
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from etl.extract import _downcast_integers, iter_sales_csv, read_customers_csv
+
+
+def test_downcast_integers_narrows_only_listed_integer_columns():
+    df = pd.DataFrame(
+        {
+            "order_id": np.array([1, 70_000], dtype="int64"),
+            "quantity": np.array([1.0, np.nan]),
+            "other": np.array([1, 2], dtype="int64"),
+            "unit_price": np.array([10.5, 20.0]),
+        }
+    )
+
+    result = _downcast_integers(df, ["order_id", "quantity", "unit_price"])
+
+    assert result["order_id"].dtype == np.int32
+    assert result["order_id"].tolist() == [1, 70_000]
+    # колонка с пропусками уже float — её не трогаем
+    assert result["quantity"].dtype == np.float64
+    assert result["unit_price"].dtype == np.float64
+    # колонки вне списка не сужаются
+    assert result["other"].dtype == np.int64
+    assert df["order_id"].dtype == np.int64
+
+
+def test_iter_sales_csv_downcasts_chunks(tmp_path):
+    path = tmp_path / "sales.csv"
+    path.write_text(
+        "order_id,customer_id,product_id,product_name,category,quantity,unit_price,order_date\n"
+        "1001,C1,P1,Prod1,Tech,2,10.5,2024-01-15\n"
+        "1002,C2,P2,Prod2,Home,,3.0,2024-01-16\n"
+        "1003,C3,P3,Prod3,Home,1,7.25,2024-01-17\n",
+        encoding="utf-8",
+    )
+
+    chunks = list(iter_sales_csv(path, chunksize=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert [chunk["order_id"].dtype for chunk in chunks] == [np.int16, np.int16]
+    # в первой порции quantity с пропуском (float64), во второй — целые
+    assert chunks[0]["quantity"].dtype == np.float64
+    assert chunks[1]["quantity"].dtype == np.int8
+
+
+def test_iter_sales_csv_keeps_text_ids_regardless_of_chunk_size(tmp_path):
+    path = tmp_path / "sales.csv"
+    path.write_text(
+        "order_id,customer_id,product_id,product_name,category,quantity,unit_price,order_date\n"
+        "1001,007,007,1.50,42,1,10.5,2024-01-15\n"
+        "1002,C2,P2,Prod2,Home,1,3.0,2024-01-16\n",
+        encoding="utf-8",
+    )
+
+    chunks = list(iter_sales_csv(path, chunksize=1))
+
+    first = chunks[0].iloc[0]
+    assert (first["customer_id"], first["product_id"]) == ("007", "007")
+    assert (first["product_name"], first["category"]) == ("1.50", "42")
+    for column in ("customer_id", "product_id", "product_name", "category"):
+        assert pd.api.types.is_string_dtype(chunks[0][column])
+
+
+def test_read_customers_csv_keeps_numeric_looking_ids_as_strings(tmp_path):
+    path = tmp_path / "customers.csv"
+    path.write_text(
+        "customer_id,customer_name,email,registration_date,region\n"
+        "007,Иван,ivan@example.com,2024-01-01,77\n",
+        encoding="utf-8",
+    )
+
+    df = read_customers_csv(path)
+
+    assert df["customer_id"].tolist() == ["007"]
+    assert df["region"].tolist() == ["77"]
+    assert pd.api.types.is_datetime64_any_dtype(df["registration_date"])
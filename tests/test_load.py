@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from etl.load import _CsvFramesReader, _to_csv_buffer
+
+COLUMNS = ("order_id", "customer_id", "order_date", "unit_price", "category")
+
+
+def _frame(rows):
+    df = pd.DataFrame(rows, columns=list(COLUMNS) + ["comment"])
+    return df.assign(
+        order_date=pd.to_datetime(df["order_date"]),
+        category=df["category"].astype("category"),
+    )
+
+
+def test_to_csv_buffer_writes_copy_csv():
+    df = _frame(
+        [
+            (1, "C1", "2024-01-15 13:45:00", 10.5, "Tech", "лишняя колонка"),
+            (2, np.nan, "2024-02-01 00:00:00", 1200.0, "Книги", None),
+        ]
+    )
+
+    data = _to_csv_buffer(df, COLUMNS).getvalue()
+
+    # NULL — пустое поле без кавычек, строки в кавычках, дата без времени,
+    # категория раскодирована в значение, лишние колонки не пишутся
+    assert data == (
+        '1,"C1",2024-01-15,10.5,"Tech"\n'
+        '2,,2024-02-01,1200,"Книги"\n'
+    ).encode("utf-8")
+
+
+def test_csv_frames_reader_streams_frames_and_counts_rows():
+    frames = [
+        _frame([(1, "C1", "2024-01-15", 10.5, "Tech", None)]),
+        _frame([]),
+        _frame(
+            [
+                (2, np.nan, "2024-02-01", 3.0, "Tech", None),
+                (3, "C3", "2024-03-31", 7.25, "Home", None),
+            ]
+        ),
+    ]
+    reader = _CsvFramesReader(frames, COLUMNS)
+
+    chunks = []
+    while True:
+        chunk = reader.read(8)
+        if not chunk:
+            break
+        assert len(chunk) <= 8
+        chunks.append(chunk)
+
+    assert b"".join(chunks) == (
+        b'1,"C1",2024-01-15,10.5,"Tech"\n'
+        b'2,,2024-02-01,3,"Tech"\n'
+        b'3,"C3",2024-03-31,7.25,"Home"\n'
+    )
+    assert reader.rows == 3
+    assert reader.read(8) == b""
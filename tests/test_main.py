@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from main import transform_sales_chunks
+
+
+def test_transform_sales_chunks_keeps_order_and_limits_in_flight():
+    read_chunks = []
+
+    def chunks():
+        for order_id in range(1, 7):
+            read_chunks.append(order_id)
+            yield pd.DataFrame(
+                [
+                    {
+                        "order_id": order_id,
+                        "customer_id": "C1",
+                        "product_id": "P1",
+                        "product_name": "Prod1",
+                        "quantity": 1,
+                        "unit_price": 10.0,
+                        "order_date": "2024-01-01",
+                        "category": "Tech",
+                    }
+                ]
+            )
+
+    loaded = []
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for result in transform_sales_chunks(pool, chunks(), max_in_flight=2):
+            # прочитаны, но ещё не отданы на загрузку (включая текущую)
+            assert len(read_chunks) - len(loaded) <= 2
+            loaded.append(int(result["order_id"].iloc[0]))
+
+    assert loaded == [1, 2, 3, 4, 5, 6]